@@ -1,12 +1,14 @@
 """Globale Projekteinstellungen für GralsBot."""
 
 MODEL_NAME = "text-embedding-3-large"
+EMBEDDING_DIM = 1024  # gekürzte Vektoren von MODEL_NAME (Parameter "dimensions")
 MODEL_SEGMENTATION = "gpt-5.1-pro-reasoning"
 MODEL_REVIEW = "gpt-4.1"
 
 PATH_RAW = "backend/data/raw"
 PATH_SEGMENTE = "backend/data/segmente"
-PATH_INDEX = "backend/data/index.pkl"
+PATH_INDEX = "backend/data/index"
+PATH_EMBEDDING_CACHE = "backend/data/embeddings_cache"
 
 SEG_MIN_WORDS = 180
 SEG_TARGET_MIN = 200
@@ -15,18 +17,22 @@ SEG_HARD_MAX = 500
 
 TOP_K = 4
 INDEX_PATH = PATH_INDEX
+INDEX_INT8 = False  # Index-Vektoren als int8 mit Skalierung je Zeile speichern
 
 __all__ = [
     "MODEL_NAME",
+    "EMBEDDING_DIM",
     "MODEL_SEGMENTATION",
     "MODEL_REVIEW",
     "PATH_RAW",
     "PATH_SEGMENTE",
     "PATH_INDEX",
+    "PATH_EMBEDDING_CACHE",
     "SEG_MIN_WORDS",
     "SEG_TARGET_MIN",
     "SEG_TARGET_MAX",
     "SEG_HARD_MAX",
     "TOP_K",
     "INDEX_PATH",
+    "INDEX_INT8",
 ]
@@ -0,0 +1,110 @@
+"""Verarbeitet mehrere Kapitel parallel mit der Segmentierungs-Pipeline.
+
+Segmentierung, Validierung, Review und Konvertierung laufen je Kapitel in
+einem eigenen Prozess. Nur der Import in den Embedding-Index erfolgt
+nacheinander im Elternprozess (geschützt durch eine Dateisperre).
+
+Die Manifest-Datei ist eine JSON-Liste von Objekten mit ``kap_nr``,
+``kap_titel``, ``input`` und optional ``output`` (Draft-JSON).
+Im Batch-Betrieb gibt es keine Rückfragen: Warnungen und Review-Findings
+werden wie bei ``process_chapter.py --non-interactive`` übernommen.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+from backend.scripts import utils
+from backend.scripts import process_chapter as pipeline
+from backend.scripts.segment_chapter import MAX_CONCURRENT
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _init_worker() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+
+def prepare_chapter(job: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+    """Run steps 1–4 for one chapter; errors are returned, not raised."""
+    kap_nr = job["kap_nr"]
+    kap_titel = job["kap_titel"]
+    result: Dict[str, Any] = {"kap_nr": kap_nr, "kap_titel": kap_titel}
+    try:
+        output = Path(job["output"]) if job.get("output") else None
+        paths = pipeline.chapter_paths(int(kap_nr), str(kap_titel), output)
+        pipeline.run_checks(
+            int(kap_nr), str(kap_titel), Path(job["input"]), paths, use_cache=use_cache
+        )
+        pipeline.convert_chapter(paths)
+    except Exception as exc:  # Fehler eines Kapitels bricht den Batch nicht ab
+        result["error"] = str(exc)
+        return result
+    result["paths"] = paths
+    return result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mehrere Kapitel parallel verarbeiten.")
+    parser.add_argument("manifest", type=Path, help="JSON-Liste der Kapitel")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MAX_CONCURRENT,
+        help=(
+            "Anzahl paralleler Prozesse; jeder stellt eigene, nicht gedrosselte "
+            f"Modellanfragen (Standard: {MAX_CONCURRENT})"
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="gespeicherte Modellantworten der Segmentierung ignorieren und neu anfragen",
+    )
+    args = parser.parse_args()
+    if args.workers <= 0:
+        parser.error("--workers muss größer als 0 sein")
+    return args
+
+
+def main() -> None:
+    _init_worker()
+    args = parse_args()
+
+    try:
+        jobs = utils.load_manifest(args.manifest)
+    except (OSError, ValueError) as exc:
+        LOGGER.error("Manifest konnte nicht gelesen werden: %s", exc)
+        sys.exit(1)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(prepare_chapter, job, not args.no_cache) for job in jobs]
+        # Import strikt nacheinander und in Manifest-Reihenfolge
+        for future in futures:
+            result = future.result()
+            label = f"Kapitel {result['kap_nr']} »{result['kap_titel']}«"
+            if "error" in result:
+                LOGGER.error("%s: %s", label, result["error"])
+                failed += 1
+                continue
+            try:
+                pipeline.import_chapter(result["paths"])
+            except pipeline.PipelineError as exc:
+                LOGGER.error("%s: %s", label, exc)
+                failed += 1
+                continue
+            LOGGER.info("%s wurde dem Index hinzugefügt.", label)
+
+    LOGGER.info("%s von %s Kapitel(n) erfolgreich verarbeitet.", len(jobs) - failed, len(jobs))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
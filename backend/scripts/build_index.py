@@ -1,59 +1,47 @@
-import os
 import json
-import pickle
 import numpy as np
 from pathlib import Path
 
-from dotenv import load_dotenv
-from openai import OpenAI
+from backend.config.settings import INDEX_PATH as CONFIG_INDEX_PATH
+from backend.scripts.embed_utils import embed_texts
+from backend.scripts.index_utils import save_index
+from backend.scripts.openai_utils import api_key
+from backend.scripts.utils import json_loads
 
-from backend.config.settings import INDEX_PATH as CONFIG_INDEX_PATH, MODEL_NAME
-
-# --- .env aus Projektwurzel laden ---
 ROOT_DIR = Path(__file__).resolve().parents[2]
-ENV_PATH = ROOT_DIR / ".env"
-load_dotenv(dotenv_path=ENV_PATH)
-
-API_KEY = os.getenv("OPENAI_API_KEY")
-if not API_KEY:
-    raise RuntimeError(f"OPENAI_API_KEY nicht gefunden. Erwartet in: {ENV_PATH}")
-print(f"🔑 OPENAI_API_KEY geladen (Länge {len(API_KEY)}).")
-
-client = OpenAI(api_key=API_KEY)
 
 DATA_DIR = ROOT_DIR / "backend" / "data" / "segmente"
 INDEX_FILE = ROOT_DIR / CONFIG_INDEX_PATH
 
-def embed_text(text: str) -> np.ndarray:
-    resp = client.embeddings.create(model=MODEL_NAME, input=text)
-    return np.array(resp.data[0].embedding, dtype="float32")
-
 def preview(path: Path) -> str:
     raw = path.read_bytes()
     head = raw[:200].decode("utf-8", errors="replace")
     return head.replace("\n", "\\n")
 
 def load_segments_from_file(fp: Path):
-    txt = fp.read_text(encoding="utf-8", errors="replace")
-    txt = txt.lstrip("\ufeff").strip()  # BOM entfernen + trim
     segs = []
-    if not txt:
-        return segs
-    if txt.startswith("["):
-        # JSON-Liste
-        data = json.loads(txt)
-        if not isinstance(data, list):
-            raise RuntimeError(f"{fp.name}: JSON beginnt mit '[' ist aber keine Liste.")
-        return data
-    # JSONL: eine Zeile = ein Objekt
-    for i, line in enumerate(txt.splitlines(), start=1):
-        s = line.strip()
-        if not s:
-            continue
-        try:
-            segs.append(json.loads(s))
-        except json.JSONDecodeError as e:
-            raise RuntimeError(f"{fp.name}: JSONL-Fehler in Zeile {i}: {e}\nZeile: {s[:120]}")
+    # -sig: BOM entfernen (auch nach seek(0))
+    with fp.open("r", encoding="utf-8-sig", errors="replace") as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        if not first:
+            return segs
+        f.seek(0)
+        if first == "[":
+            # JSON-Liste
+            data = json_loads(f.read())
+            if not isinstance(data, list):
+                raise RuntimeError(f"{fp.name}: JSON beginnt mit '[' ist aber keine Liste.")
+            return data
+        # JSONL: eine Zeile = ein Objekt, direkt vom Dateiobjekt gelesen
+        for i, line in enumerate(f, start=1):
+            if line.isspace():
+                continue
+            try:
+                segs.append(json_loads(line))
+            except json.JSONDecodeError as e:
+                raise RuntimeError(f"{fp.name}: JSONL-Fehler in Zeile {i}: {e}\nZeile: {line.strip()[:120]}")
     return segs
 
 def build_index():
@@ -63,30 +51,35 @@ def build_index():
         print("⚠️ Keine .jsonl/.json Dateien gefunden.")
         return
 
-    index = []
+    all_segs = []
     for f in files:
         size = f.stat().st_size
         print(f"➡️  Lese: {f.name}  (Bytes: {size})")
         print(f"   🔎 Vorschau: {preview(f)[:160]}{'…' if size>200 else ''}")
         segs = load_segments_from_file(f)
         print(f"   • Segmente in Datei: {len(segs)}")
-        for seg in segs:
-            emb = embed_text(seg["text"])
-            index.append({
-                "id": seg["id"],
-                "kap_nr": seg["kap_nr"],
-                "kap_titel": seg["kap_titel"],
-                "seg_nr": seg["seg_nr"],
-                "text": seg["text"],
-                "embedding": emb
-            })
-            print(f"   ✅ eingebettet: {seg['id']}")
+        all_segs.extend(segs)
+
+    # Alle Segmente in einem Rutsch einbetten (Batches, parallel)
+    embeddings: np.ndarray = embed_texts([seg["text"] for seg in all_segs])
+    print(f"   ✅ eingebettet: {len(all_segs)} Segmente, Matrix {embeddings.shape}")
+
+    meta = [
+        {
+            "id": seg["id"],
+            "kap_nr": seg["kap_nr"],
+            "kap_titel": seg["kap_titel"],
+            "seg_nr": seg["seg_nr"],
+            "text": seg["text"],
+        }
+        for seg in all_segs
+    ]
 
-    with INDEX_FILE.open("wb") as out:
-        pickle.dump(index, out)
-    print(f"💾 Index gespeichert: {INDEX_FILE} (Segmente: {len(index)})")
+    save_index(meta, embeddings, INDEX_FILE)
+    print(f"💾 Index gespeichert: {INDEX_FILE} (Segmente: {len(meta)})")
 
 if __name__ == "__main__":
     print(f"🚀 Starte Index-Bau … (ROOT={ROOT_DIR})")
+    print(f"🔑 OPENAI_API_KEY geladen (Länge {len(api_key())}).")
     build_index()
     print("✨ Fertig.")
@@ -3,13 +3,13 @@
 from __future__ import annotations
 
 import argparse
-import json
 from pathlib import Path
 from typing import Iterable, List, Optional
 
-from backend.scripts.utils import project_root
+from backend.scripts.utils import json_dumps, json_loads, project_root
 
 DEFAULT_DIRECTORY = project_root() / "backend" / "data" / "segmente"
+WRITE_CHUNK_SIZE = 1024  # Objekte pro write()-Aufruf
 
 
 def convert_file(input_path: Path, output_path: Optional[Path] = None) -> Path:
@@ -21,15 +21,16 @@ def convert_file(input_path: Path, output_path: Optional[Path] = None) -> Path:
     else:
         output_path = output_path.resolve()
 
-    with input_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = json_loads(input_path.read_bytes())
     if not isinstance(data, list):
         raise ValueError(f"Erwartet wurde eine Liste von Objekten in {input_path}.")
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w", encoding="utf-8") as out:
-        for obj in data:
-            out.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    with output_path.open("wb") as out:
+        # Zeilen blockweise zusammenfügen statt einem write() pro Objekt
+        for i in range(0, len(data), WRITE_CHUNK_SIZE):
+            chunk = data[i : i + WRITE_CHUNK_SIZE]
+            out.write(b"\n".join(json_dumps(obj) for obj in chunk) + b"\n")
 
     print(f"✅ konvertiert: {input_path.name} -> {output_path.name}")
     return output_path
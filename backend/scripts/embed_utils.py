@@ -0,0 +1,177 @@
+"""Gemeinsame Embedding-Pipeline für build_index.py und add_chapter.py.
+
+Texte werden nach Länge sortiert in Batches geschnitten, parallel (mit Retry)
+an die API geschickt und über einen Inhalts-Hash gecacht.
+
+Der Cache ist ein Verzeichnis, in das nur angehängt wird: ``keys-<dim>.txt``
+(ein Hash pro Zeile) und ``vectors-<dim>.f16`` (die Embeddings als rohe
+float16-Zeilen in derselben Reihenfolge).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from backend.config.settings import EMBEDDING_DIM, MODEL_NAME, PATH_EMBEDDING_CACHE
+from backend.scripts.openai_utils import new_async_client, with_retry_async
+from backend.scripts.utils import project_root
+
+LOGGER = logging.getLogger(__name__)
+EMBEDDING_MODEL = MODEL_NAME  # muss zu deinem Index & query_index.py passen!
+CACHE_PATH = project_root() / PATH_EMBEDDING_CACHE  # Text-Hash → Embedding
+BATCH_SIZE = 64  # Embeddings in Batches schicken (sparsam & stabil)
+MAX_INFLIGHT = 8  # max. gleichzeitige Embedding-Requests
+TOKEN_BUDGET = 8000  # grob geschätzte Tokens pro Embedding-Request
+CACHE_DTYPE = np.float16  # wie im Index; Embeddings sind normalisiert
+
+
+async def embed_batch(client: AsyncOpenAI, texts: List[str]) -> List[List[float]]:
+    resp = await with_retry_async(
+        client.embeddings.create, model=EMBEDDING_MODEL, input=texts, dimensions=EMBEDDING_DIM
+    )
+    return [d.embedding for d in resp.data]
+
+
+async def _gather_bounded(tasks, max_inflight: int = MAX_INFLIGHT) -> list:
+    """Wie asyncio.gather, aber mit höchstens ``max_inflight`` laufenden Tasks.
+
+    Die Reihenfolge der Ergebnisse entspricht der Reihenfolge von ``tasks``.
+    """
+    sem = asyncio.Semaphore(max_inflight)
+
+    async def run(coro):
+        async with sem:
+            return await coro
+
+    return await asyncio.gather(*(run(t) for t in tasks))
+
+
+def _make_batches(texts: List[str]) -> List[List[int]]:
+    """Gruppiert die Indizes von ``texts`` nach Länge sortiert in Batches.
+
+    Ein Batch enthält höchstens BATCH_SIZE Texte und (geschätzt) höchstens
+    TOKEN_BUDGET Tokens, damit kurze und sehr lange Texte nicht gemischt werden.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches: List[List[int]] = []
+    current: List[int] = []
+    tokens = 0
+    for i in order:
+        estimate = len(texts[i]) // 4 + 1
+        if current and (len(current) >= BATCH_SIZE or tokens + estimate > TOKEN_BUDGET):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(i)
+        tokens += estimate
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _embed_batches(texts: List[str], batches: List[List[int]]) -> list:
+    # Ein Client pro Lauf: alle Batches teilen sich denselben Verbindungspool.
+    async with new_async_client() as client:
+        tasks = [embed_batch(client, [texts[i] for i in batch]) for batch in batches]
+        return await _gather_bounded(tasks, max_inflight=MAX_INFLIGHT)
+
+
+def _cache_key(text: str) -> str:
+    # Modell und Dimension gehören zum Schlüssel, sonst passen alte Vektoren nicht
+    raw = f"{EMBEDDING_MODEL}|{EMBEDDING_DIM}|{text}".encode("utf-8")
+    return blake2b(raw, digest_size=16).hexdigest()
+
+
+def _cache_files(path: Path) -> Tuple[Path, Path]:
+    # Dimension im Dateinamen: Zeilen anderer Länge werden nie falsch gelesen
+    return path / f"keys-{EMBEDDING_DIM}.txt", path / f"vectors-{EMBEDDING_DIM}.f16"
+
+
+def load_embedding_cache(path=CACHE_PATH) -> Tuple[Dict[str, int], np.ndarray]:
+    """Return ``(rows, vectors)``: hash → row number, plus the cached rows.
+
+    The vectors are memory-mapped read-only. A write that was interrupted
+    between the two files is cut back to the entries present in both.
+    """
+    path = Path(path)
+    keys_path, vectors_path = _cache_files(path)
+    if not keys_path.exists() or not vectors_path.exists():
+        return {}, np.empty((0, EMBEDDING_DIM), dtype=CACHE_DTYPE)
+
+    keys = keys_path.read_text(encoding="ascii").split()
+    row_bytes = EMBEDDING_DIM * np.dtype(CACHE_DTYPE).itemsize
+    n_rows = vectors_path.stat().st_size // row_bytes
+    n = min(len(keys), n_rows)
+    if len(keys) != n or vectors_path.stat().st_size != n * row_bytes:
+        LOGGER.warning("Embedding-Cache unvollständig, kürze auf %s Einträge.", n)
+        keys = keys[:n]
+        keys_path.write_text("".join(k + "\n" for k in keys), encoding="ascii")
+        os.truncate(vectors_path, n * row_bytes)
+    if n == 0:
+        return {}, np.empty((0, EMBEDDING_DIM), dtype=CACHE_DTYPE)
+    vectors = np.memmap(vectors_path, dtype=CACHE_DTYPE, mode="r", shape=(n, EMBEDDING_DIM))
+    return {k: i for i, k in enumerate(keys)}, vectors
+
+
+def append_embedding_cache(keys: List[str], vectors: np.ndarray, path=CACHE_PATH) -> None:
+    """Append ``keys`` and their ``vectors`` to the cache; existing data is not rewritten."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    keys_path, vectors_path = _cache_files(path)
+    rows = np.ascontiguousarray(vectors, dtype=CACHE_DTYPE)
+    # erst die Vektoren, dann die Schlüssel: ein Abbruch hinterlässt höchstens
+    # überzählige Zeilen, die beim Laden abgeschnitten werden
+    with vectors_path.open("ab") as f:
+        f.write(rows.tobytes())
+    with keys_path.open("a", encoding="ascii") as f:
+        f.write("".join(k + "\n" for k in keys))
+
+
+def embed_texts(texts: List[str], cache_path=CACHE_PATH) -> np.ndarray:
+    """Bettet ``texts`` ein und liefert eine (N, D)-float32-Matrix.
+
+    Zeile i gehört zu ``texts[i]``. Bereits eingebettete Texte (gleicher
+    Inhalt, gleiches Modell) kommen aus dem Cache unter ``cache_path``; nur
+    fehlende gehen – gebündelt und parallel – an die API.
+    """
+    if not texts:
+        return np.empty((0, EMBEDDING_DIM), dtype="float32")
+
+    rows, cached = load_embedding_cache(cache_path)
+    keys = [_cache_key(t) for t in texts]
+    hits = sum(k in rows for k in keys)
+    if hits:
+        print(f"♻️  {hits} Embedding(s) aus dem Cache übernommen.")
+    # gleiche Texte nur einmal einbetten
+    missing = list({k: i for i, k in enumerate(keys) if k not in rows}.values())
+
+    fresh: Dict[str, np.ndarray] = {}
+    if missing:
+        todo = [texts[i] for i in missing]
+        batches = _make_batches(todo)
+        results = asyncio.run(_embed_batches(todo, batches))
+        for batch, vecs in zip(batches, results):
+            for j, vec in zip(batch, vecs):
+                fresh[keys[missing[j]]] = np.asarray(vec, dtype="float32")
+        append_embedding_cache(list(fresh), np.asarray(list(fresh.values())), cache_path)
+
+    out = np.empty((len(texts), EMBEDDING_DIM), dtype="float32")
+    for i, k in enumerate(keys):
+        out[i] = fresh[k] if k in fresh else cached[rows[k]]
+    return out
+
+
+__all__ = [
+    "EMBEDDING_MODEL",
+    "embed_batch",
+    "load_embedding_cache",
+    "append_embedding_cache",
+    "embed_texts",
+]
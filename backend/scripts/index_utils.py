@@ -0,0 +1,448 @@
+"""Laden und Speichern des Embedding-Index.
+
+Der Index ist ein Verzeichnis mit zwei Dateien:
+
+- ``meta.jsonl``: ein JSON-Objekt pro Segment (append-only),
+- ``vectors.npy``: die L2-normalisierte Embedding-Matrix (float16), Zeile i ↔
+  Zeile i in ``meta.jsonl``.
+
+Mit ``INDEX_INT8`` wird die Matrix stattdessen als int8 gespeichert; die
+Skalierung je Zeile liegt dann in ``scales.npy``.
+
+Ist ``faiss`` installiert, wird für große Indizes zusätzlich ein HNSW-Graph
+(``hnsw.faiss``) für die Näherungssuche abgelegt.
+
+Ein alter Pickle-Index (``index.pkl`` neben dem Verzeichnis) wird beim ersten
+Laden einmalig in dieses Format übernommen.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backend.config.settings import INDEX_INT8
+from backend.scripts.utils import json_dumps, json_loads
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - z. B. Windows
+    fcntl = None
+
+try:
+    import faiss
+except ImportError:  # pragma: no cover - optional dependency
+    faiss = None
+
+LOGGER = logging.getLogger(__name__)
+Index = Tuple[List[Dict[str, Any]], Optional[np.ndarray]]
+META_FILE = "meta.jsonl"
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+HNSW_FILE = "hnsw.faiss"
+HNSW_MIN_ROWS = 10_000  # darunter ist die lineare Suche schnell genug
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+# Normalisierte Embeddings haben einen kleinen Wertebereich; float16 halbiert
+# Speicher und I/O ohne messbaren Einfluss auf das Ranking.
+VECTOR_DTYPE = np.float16
+SCORE_BLOCK_ROWS = 8192  # Zeilen je float32-Block beim Scoring
+
+
+def normalise_vectors(vectors: np.ndarray) -> np.ndarray:
+    """Return ``vectors`` as L2-normalised float32 rows."""
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def quantise_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return ``(rows, scales)`` with ``vectors ≈ rows * scales[:, None]``.
+
+    Symmetric per-row quantisation: the largest absolute value of each row
+    maps to ±127.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.empty(0, np.float32)
+    scales[scales == 0] = 1.0
+    rows = np.round(vectors / scales[:, None]).astype(np.int8)
+    return rows, scales.astype(np.float32)
+
+
+def _from_legacy(entries: List[Dict[str, Any]]) -> Index:
+    """Convert the old list-of-dicts layout (one ``embedding`` per entry)."""
+    if not entries:
+        return [], None
+    meta = [{k: v for k, v in e.items() if k != "embedding"} for e in entries]
+    vectors = np.asarray([e["embedding"] for e in entries], dtype=np.float32)
+    return meta, normalise_vectors(vectors)
+
+
+def _load_pickle(path: Path) -> Index:
+    """Read the old single-file pickle index (a list of segment dicts)."""
+    with open(path, "rb") as f:
+        entries = pickle.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(
+            f"{path}: unbekanntes Pickle-Format (erwartet: Liste von Segmenten). "
+            "Bitte den Index mit build_index.py neu erstellen."
+        )
+    return _from_legacy(entries)
+
+
+def _read_meta(path: Path) -> List[Dict[str, Any]]:
+    """Parse ``meta.jsonl``, skipping a last line cut off by an interrupted append."""
+    with path.open("rb") as f:
+        lines = [line for line in f if not line.isspace()]
+    if lines and not lines[-1].endswith(b"\n"):
+        LOGGER.warning("%s: unvollständige letzte Zeile wird ignoriert.", path)
+        lines.pop()
+    return [json_loads(line) for line in lines]
+
+
+def _meta_rows(path: Path) -> int:
+    """Return the number of complete lines in the ``meta.jsonl`` at ``path``.
+
+    ``meta.jsonl`` is always written last, so this is the number of valid
+    rows; anything beyond it in ``vectors.npy``/``scales.npy`` is left over
+    from an interrupted write.
+    """
+    with path.open("rb") as f:
+        return sum(1 for line in f if line.endswith(b"\n") and not line.isspace())
+
+
+def _repair_meta(path: Path) -> None:
+    """Cut a partial last line (interrupted append) off ``meta.jsonl``."""
+    data = path.read_bytes()
+    if not data or data.endswith(b"\n"):
+        return
+    os.truncate(path, data.rfind(b"\n") + 1)
+    LOGGER.warning("%s: unvollständige letzte Zeile wurde entfernt.", path)
+
+
+def _trim_rows(rows: np.ndarray, n: int, name: str, path: Path) -> np.ndarray:
+    """Return the first ``n`` of ``rows``, warning if an interrupted write left more."""
+    if len(rows) < n:
+        raise ValueError(
+            f"Index inkonsistent: {n} Metadaten, {len(rows)} {name} in {path}. "
+            "Bitte den Index mit build_index.py neu erstellen."
+        )
+    if len(rows) > n:
+        LOGGER.warning(
+            "%s: %s überzählige %s (abgebrochener Schreibvorgang) werden ignoriert.",
+            path,
+            len(rows) - n,
+            name,
+        )
+    return rows[:n]
+
+
+def _write_meta(path: Path, meta: List[Dict[str, Any]]) -> None:
+    """Write ``meta`` to ``path`` via a temporary file and atomic rename."""
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_bytes(b"".join(json_dumps(m) + b"\n" for m in meta))
+    os.replace(tmp, path)
+
+
+def _write_vectors(path: Path, vectors: np.ndarray) -> None:
+    """Write ``vectors`` to ``path`` via a temporary file and atomic rename."""
+    tmp = path.with_name(f"{path.stem}.tmp.npy")
+    with tmp.open("wb") as f:
+        np.save(f, vectors)
+    os.replace(tmp, path)
+
+
+def _append_rows(path: Path, rows: np.ndarray, keep: int) -> None:
+    """Replace the ``.npy`` array at ``path`` by its first ``keep`` rows plus ``rows``.
+
+    The dtype is kept; rows beyond ``keep`` (left by an interrupted append)
+    are dropped.
+    """
+    old = _trim_rows(np.load(path, mmap_mode="r"), keep, "Zeilen", path)
+    n = keep
+    tmp = path.with_name(f"{path.stem}.tmp.npy")
+    out = np.lib.format.open_memmap(
+        tmp, mode="w+", dtype=old.dtype, shape=(n + len(rows),) + old.shape[1:]
+    )
+    out[:n] = old
+    out[n:] = rows
+    out.flush()
+    del out, old
+    os.replace(tmp, path)
+
+
+def _migrate_legacy(path: Path) -> bool:
+    """Convert ``<path>.pkl`` into the index directory ``path`` if present."""
+    legacy = path.with_suffix(".pkl")
+    if not legacy.is_file():
+        return False
+    meta, vectors = _load_pickle(legacy)
+    if vectors is None:
+        return False
+    save_index(meta, vectors, path)
+    LOGGER.warning(
+        "Alter Pickle-Index %s wurde nach %s übernommen und kann gelöscht werden.",
+        legacy,
+        path,
+    )
+    return True
+
+
+def _float_rows(vectors: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    rows = np.asarray(vectors, dtype=np.float32)
+    if scales is not None:
+        rows = rows * scales[:, None]
+    return np.ascontiguousarray(rows)
+
+
+def _write_hnsw(path: Path, ann) -> None:
+    tmp = path.with_name(f"{path.stem}.tmp.faiss")
+    faiss.write_index(ann, str(tmp))
+    os.replace(tmp, path)
+
+
+def _update_hnsw(path: Path, new_rows: Optional[np.ndarray] = None) -> None:
+    """Keep ``hnsw.faiss`` in step with ``vectors.npy`` after a write.
+
+    Adds ``new_rows`` to an existing graph, builds a new one once the index is
+    large enough or the old graph missed a write, and removes a graph that can
+    no longer be kept in sync.
+    """
+    hnsw_path = path / HNSW_FILE
+    if faiss is None:
+        if hnsw_path.exists():
+            LOGGER.warning("faiss nicht installiert – veralteter %s wird entfernt.", hnsw_path)
+            hnsw_path.unlink()
+        return
+    if new_rows is not None and hnsw_path.exists():
+        ann = faiss.read_index(str(hnsw_path))
+        if ann.ntotal + len(new_rows) == _meta_rows(path / META_FILE):
+            ann.add(np.ascontiguousarray(new_rows, dtype=np.float32))
+            _write_hnsw(hnsw_path, ann)
+            return
+    vectors = np.load(path / VECTORS_FILE, mmap_mode="r")
+    if len(vectors) < HNSW_MIN_ROWS:
+        hnsw_path.unlink(missing_ok=True)
+        return
+    ann = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    ann.add(_float_rows(vectors, load_scales(path)))
+    _write_hnsw(hnsw_path, ann)
+
+
+def load_index(path) -> Index:
+    """Load ``(meta, vectors)`` from the index directory ``path``.
+
+    ``meta[i]`` describes the segment whose embedding is ``vectors[i]``. The
+    vectors are memory-mapped read-only. Rows left behind by an interrupted
+    write (beyond the last line of ``meta.jsonl``) are ignored with a warning.
+    Returns ``([], None)`` if the index does not exist yet.
+    """
+    path = Path(path)
+    if path.is_file():
+        return _load_pickle(path)
+    meta_path = path / META_FILE
+    vectors_path = path / VECTORS_FILE
+    if not meta_path.exists() or not vectors_path.exists():
+        if not _migrate_legacy(path):
+            return [], None
+    meta = _read_meta(meta_path)
+    vectors = np.load(vectors_path, mmap_mode="r")
+    return meta, _trim_rows(vectors, len(meta), "Vektoren", path)
+
+
+def load_scales(path) -> Optional[np.ndarray]:
+    """Return the per-row scales of an int8 index at ``path``, else ``None``."""
+    path = Path(path)
+    vectors_path = path / VECTORS_FILE
+    if path.is_file() or not vectors_path.exists():
+        return None
+    vectors = np.load(vectors_path, mmap_mode="r")
+    if vectors.dtype != np.int8:
+        return None
+    scales = np.load(path / SCALES_FILE)
+    return _trim_rows(scales, _meta_rows(path / META_FILE), "Skalen", path)
+
+
+def load_hnsw(path):
+    """Return the HNSW graph of the index at ``path``, or ``None``.
+
+    ``None`` means brute-force search: faiss is not installed, the index is
+    too small to have a graph, or the graph does not match the vectors.
+    """
+    hnsw_path = Path(path) / HNSW_FILE
+    if faiss is None or not hnsw_path.exists():
+        return None
+    ann = faiss.read_index(str(hnsw_path))
+    rows = _meta_rows(Path(path) / META_FILE)
+    if ann.ntotal != rows:
+        LOGGER.warning(
+            "%s passt nicht zum Index (%s/%s Zeilen), nutze lineare Suche.",
+            hnsw_path,
+            ann.ntotal,
+            rows,
+        )
+        return None
+    ann.hnsw.efSearch = HNSW_EF_SEARCH
+    return ann
+
+
+def _check_target(meta: List[Dict[str, Any]], vectors: np.ndarray, path: Path) -> None:
+    if len(meta) != len(vectors):
+        raise ValueError(
+            f"Index inkonsistent: {len(meta)} Metadaten, {len(vectors)} Vektoren."
+        )
+    if path.is_file():
+        raise ValueError(
+            f"{path} ist ein alter Pickle-Index. Bitte ein Index-Verzeichnis angeben "
+            "oder den Index mit build_index.py neu erstellen."
+        )
+
+
+def save_index(meta: List[Dict[str, Any]], vectors: np.ndarray, path, int8: bool = INDEX_INT8) -> None:
+    """Write a complete index (``meta`` plus normalised vectors) to ``path``.
+
+    With ``int8`` the vectors are quantised per row (see
+    :func:`quantise_int8`) instead of stored as float16.
+    """
+    path = Path(path)
+    _check_target(meta, vectors, path)
+    path.mkdir(parents=True, exist_ok=True)
+    vectors = normalise_vectors(vectors)
+    # meta.jsonl wird zuletzt geschrieben: bis dahin gilt der Index als leer,
+    # damit ein Abbruch keine alten Metadaten mit neuen Vektoren paart
+    meta_path = path / META_FILE
+    if meta_path.exists():
+        _write_meta(meta_path, [])
+    if int8:
+        rows, scales = quantise_int8(vectors)
+        _write_vectors(path / SCALES_FILE, scales)
+        _write_vectors(path / VECTORS_FILE, rows)
+    else:
+        _write_vectors(path / VECTORS_FILE, vectors.astype(VECTOR_DTYPE))
+        (path / SCALES_FILE).unlink(missing_ok=True)
+    _write_meta(meta_path, meta)
+    _update_hnsw(path)
+
+
+def append_index(meta: List[Dict[str, Any]], vectors: np.ndarray, path) -> None:
+    """Append ``meta`` and ``vectors`` to the index at ``path``.
+
+    Only the new metadata lines are written; the vector file is extended by
+    copying the raw rows into a new memory-mapped ``.npy`` once per call.
+    The storage format (float16, float32 or int8) of the index is kept.
+    ``meta.jsonl`` is written last, so an interrupted append leaves at most
+    surplus vector rows, which are dropped here and ignored on load.
+    """
+    path = Path(path)
+    _check_target(meta, vectors, path)
+    vectors_path = path / VECTORS_FILE
+    if not vectors_path.exists():
+        save_index(meta, vectors, path)
+        return
+
+    meta_path = path / META_FILE
+    _repair_meta(meta_path)
+    keep = _meta_rows(meta_path)
+    new_rows = normalise_vectors(vectors)
+    stored = new_rows
+    if np.load(vectors_path, mmap_mode="r").dtype == np.int8:
+        stored, scales = quantise_int8(new_rows)
+        _append_rows(path / SCALES_FILE, scales, keep)
+    # ältere Indizes sind float32; _append_rows behält den dtype bei
+    _append_rows(vectors_path, stored, keep)
+
+    with meta_path.open("ab") as f:
+        f.write(b"".join(json_dumps(m) + b"\n" for m in meta))
+    _update_hnsw(path, new_rows)
+
+
+def score_vectors(
+    vectors: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Return the inner product of every row of ``vectors`` with ``query``.
+
+    float16 and int8 rows (e.g. the memory-mapped index) are converted block
+    by block, so the matrix is never copied as a whole. int8 rows need their
+    ``scales`` from :func:`load_scales`.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if vectors.dtype == np.int8 and scales is None:
+        raise ValueError("int8-Index ohne Skalen kann nicht bewertet werden.")
+    if vectors.dtype == np.float32:
+        return vectors @ query
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = vectors[start : start + SCORE_BLOCK_ROWS]
+        scores[start : start + len(block)] = block.astype(np.float32) @ query
+    if vectors.dtype == np.int8:
+        scores *= scales
+    return scores
+
+
+def search_index(
+    vectors: np.ndarray,
+    query: np.ndarray,
+    k: int,
+    scales: Optional[np.ndarray] = None,
+    ann=None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return ``(indices, scores)`` of the ``k`` best rows, best first.
+
+    ``vectors`` are the normalised index rows, so the scores are cosine
+    similarities once ``query`` is normalised as well. With an HNSW graph
+    from :func:`load_hnsw` the search is approximate instead of linear.
+    """
+    query = normalise_vectors(np.asarray(query, dtype=np.float32)[None, :])[0]
+    if ann is not None:
+        scores, top = ann.search(query[None, :], min(k, ann.ntotal))
+        found = top[0] >= 0
+        return top[0][found], scores[0][found]
+    scores = score_vectors(vectors, query, scales)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+@contextmanager
+def index_lock(path) -> Iterator[None]:
+    """Hold an exclusive lock on the index at ``path`` (POSIX only).
+
+    Serialises writers from several processes; on platforms without
+    ``fcntl`` this is a no-op.
+    """
+    path = Path(path)
+    lock_path = path.with_name(f"{path.name}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+__all__ = [
+    "normalise_vectors",
+    "quantise_int8",
+    "load_index",
+    "load_scales",
+    "load_hnsw",
+    "save_index",
+    "append_index",
+    "score_vectors",
+    "search_index",
+    "index_lock",
+]
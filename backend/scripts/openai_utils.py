@@ -0,0 +1,148 @@
+"""Gemeinsame Helfer für Aufrufe der OpenAI-API."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from dotenv import load_dotenv
+
+try:
+    from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, OpenAI, RateLimitError
+except ImportError as exc:  # pragma: no cover - graceful error
+    raise SystemExit(
+        "Das Paket 'openai' wird benötigt, ist aber nicht installiert."
+    ) from exc
+
+from backend.scripts.utils import project_root
+
+LOGGER = logging.getLogger(__name__)
+T = TypeVar("T")
+
+RETRY_ATTEMPTS = 5
+RETRY_MAX_DELAY = 30.0
+RETRY_EXCEPTIONS = (RateLimitError, APITimeoutError, APIConnectionError)
+
+
+@functools.lru_cache(maxsize=1)
+def api_key() -> str:
+    """Load ``OPENAI_API_KEY`` from the project ``.env`` (once per process)."""
+    load_dotenv(project_root() / ".env")
+    key = os.getenv("OPENAI_API_KEY")
+    if not key:
+        raise RuntimeError("OPENAI_API_KEY nicht gefunden. Bitte in .env setzen.")
+    return key
+
+
+@functools.lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """Return the shared synchronous client (one connection pool per process)."""
+    return OpenAI(api_key=api_key())
+
+
+def new_async_client() -> AsyncOpenAI:
+    """Return a fresh async client.
+
+    The connection pool of an async client is bound to its event loop, so use
+    one client per ``asyncio.run`` and share it across all requests there.
+    """
+    return AsyncOpenAI(api_key=api_key())
+
+
+def retry_delay(exc: Exception, attempt: int) -> float:
+    """Return the wait time before retry ``attempt`` (0-based).
+
+    Honours a ``Retry-After`` header if the API sent one, otherwise uses
+    exponential backoff with jitter.
+    """
+    response = getattr(exc, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), RETRY_MAX_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return min(2**attempt + random.random(), RETRY_MAX_DELAY)
+
+
+def with_retry(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call ``func`` and retry transient API errors with backoff."""
+    for attempt in range(RETRY_ATTEMPTS - 1):
+        try:
+            return func(*args, **kwargs)
+        except RETRY_EXCEPTIONS as exc:
+            delay = retry_delay(exc, attempt)
+            LOGGER.warning("OpenAI-Fehler (%s), neuer Versuch in %.1f s ...", exc, delay)
+            time.sleep(delay)
+    return func(*args, **kwargs)
+
+
+class RateLimiter:
+    """Token bucket for requests and tokens per minute.
+
+    Create one limiter per event loop and ``await acquire(tokens)`` before
+    each request; waiting callers are served in order.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise ValueError("Rate-Limits müssen größer als 0 sein.")
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self._requests = self.requests_per_minute
+        self._tokens = self.tokens_per_minute
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        minutes = (now - self._last) / 60
+        self._last = now
+        self._requests = min(
+            self.requests_per_minute, self._requests + minutes * self.requests_per_minute
+        )
+        self._tokens = min(self.tokens_per_minute, self._tokens + minutes * self.tokens_per_minute)
+
+    async def acquire(self, tokens: int) -> None:
+        # ein einzelner Request größer als das Minutenbudget muss trotzdem durch
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    (1 - self._requests) / self.requests_per_minute,
+                    (tokens - self._tokens) / self.tokens_per_minute,
+                )
+                await asyncio.sleep(wait * 60)
+
+
+async def with_retry_async(func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+    """Async variant of :func:`with_retry`."""
+    for attempt in range(RETRY_ATTEMPTS - 1):
+        try:
+            return await func(*args, **kwargs)
+        except RETRY_EXCEPTIONS as exc:
+            delay = retry_delay(exc, attempt)
+            LOGGER.warning("OpenAI-Fehler (%s), neuer Versuch in %.1f s ...", exc, delay)
+            await asyncio.sleep(delay)
+    return await func(*args, **kwargs)
+
+
+__all__ = [
+    "api_key",
+    "get_client",
+    "new_async_client",
+    "RETRY_ATTEMPTS",
+    "RateLimiter",
+    "retry_delay",
+    "with_retry",
+    "with_retry_async",
+]
@@ -3,11 +3,10 @@
 from __future__ import annotations
 
 import argparse
-import json
 import logging
 import sys
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from backend.config import settings
 from backend.scripts import utils
@@ -16,7 +15,7 @@ from backend.scripts import validate_segments as validator_module
 from backend.scripts import review_segments as review_module
 from backend.scripts import convert_to_jsonl as convert_module
 from backend.scripts import add_chapter as add_chapter_module
-from backend.scripts.segment_utils import save_segments
+from backend.scripts.segment_utils import read_chapter_text, save_segments
 
 LOGGER = logging.getLogger(__name__)
 
@@ -37,6 +36,11 @@ def parse_args() -> argparse.Namespace:
         required=False,
         help="Optionaler Pfad für das Draft-JSON",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="gespeicherte Modellantwort der Segmentierung ignorieren und neu anfragen",
+    )
     return parser.parse_args()
 
 
@@ -60,66 +64,109 @@ def summarise_findings(report: Dict[str, Any], review: Dict[str, Any]) -> None:
             )
 
 
-def main() -> None:
-    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
-    args = parse_args()
+class PipelineError(RuntimeError):
+    """Ein Pipeline-Schritt ist fehlgeschlagen (Meldung nennt den Schritt)."""
 
-    segment_dir = Path(settings.PATH_SEGMENTE)
-    segment_dir.mkdir(parents=True, exist_ok=True)
 
-    if args.output:
-        draft_path = args.output
-    else:
-        draft_path = utils.default_segment_path(args.kap_nr, args.kap_titel, segment_dir)
+def _step(label: str, func: Callable[..., Any], *args: Any) -> Any:
+    try:
+        return func(*args)
+    except Exception as exc:
+        raise PipelineError(f"{label} fehlgeschlagen: {exc}") from exc
+
 
-    base = utils.chapter_basename(args.kap_nr, args.kap_titel)
-    validation_report_path = segment_dir / f"{base}_validation.json"
-    review_report_path = segment_dir / f"{base}_review.json"
-    final_jsonl_path = segment_dir / f"{base}_final.jsonl"
+def chapter_paths(
+    kap_nr: int, kap_titel: str, output: Optional[Path] = None
+) -> Dict[str, Path]:
+    """Return the artefact paths (draft, reports, final JSONL) of a chapter."""
+    segment_dir = Path(settings.PATH_SEGMENTE)
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    base = utils.chapter_basename(kap_nr, kap_titel)
+    return {
+        "draft": output or utils.default_segment_path(kap_nr, kap_titel, segment_dir),
+        "validation": segment_dir / f"{base}_validation.json",
+        "review": segment_dir / f"{base}_review.json",
+        "final": segment_dir / f"{base}_final.jsonl",
+    }
+
+
+def run_checks(
+    kap_nr: int,
+    kap_titel: str,
+    input_path: Path,
+    paths: Dict[str, Path],
+    use_cache: bool = True,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Run segmentation, validation and review; return ``(report, review)``."""
+    original_text = _step("Lesen des Kapiteltexts", read_chapter_text, input_path)
+    draft_path = paths["draft"]
 
     LOGGER.info("1/5 Segmentierung starten ...")
-    try:
-        segment_module.segment_chapter(
-            args.kap_nr, args.kap_titel, args.input, draft_path
-        )
-    except Exception as exc:
-        LOGGER.error("Segmentierung fehlgeschlagen: %s", exc)
-        sys.exit(1)
+    _step(
+        "Segmentierung",
+        segment_module.segment_chapter,
+        kap_nr, kap_titel, input_path, draft_path, original_text, use_cache,
+    )
 
     LOGGER.info("2/5 Validierung durchführen ...")
-    try:
-        report, normalised_segments = validator_module.validate_segments(
-            args.kap_nr, args.input, draft_path
-        )
-    except Exception as exc:
-        LOGGER.error("Validierung fehlgeschlagen: %s", exc)
-        sys.exit(1)
-
-    validation_report_path.write_text(
-        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    report, normalised_segments = _step(
+        "Validierung",
+        validator_module.validate_segments,
+        kap_nr, input_path, draft_path, original_text,
     )
-    LOGGER.info("Validierungsreport gespeichert unter %s", validation_report_path)
+
+    paths["validation"].write_bytes(utils.json_dumps(report, indent=True))
+    LOGGER.info("Validierungsreport gespeichert unter %s", paths["validation"])
 
     if report["status"] == "errors":
-        LOGGER.error("Validierung meldet Fehler. Pipeline wird abgebrochen.")
-        sys.exit(1)
+        raise PipelineError("Validierung meldet Fehler. Pipeline wird abgebrochen.")
 
     save_segments(draft_path, normalised_segments)
 
     LOGGER.info("3/5 Semantischen Review starten ...")
+    review = _step(
+        "Review",
+        review_module.review_segments,
+        kap_nr, kap_titel, input_path, draft_path, original_text,
+    )
+
+    paths["review"].write_bytes(utils.json_dumps(review, indent=True))
+    LOGGER.info("Review-Report gespeichert unter %s", paths["review"])
+    return report, review
+
+
+def convert_chapter(paths: Dict[str, Path]) -> Path:
+    LOGGER.info("4/5 Konvertiere Segmente in JSONL ...")
+    return _step(
+        "Konvertierung nach JSONL",
+        convert_module.convert_file,
+        paths["draft"], paths["final"],
+    )
+
+
+def import_chapter(paths: Dict[str, Path]) -> None:
+    LOGGER.info("5/5 Aktualisiere Embedding-Index ...")
+    _step(
+        "Import in den Index",
+        add_chapter_module.add_chapter,
+        str(paths["final"]), str(Path(settings.PATH_INDEX)),
+    )
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    args = parse_args()
+
+    paths = chapter_paths(args.kap_nr, args.kap_titel, args.output)
+
     try:
-        review = review_module.review_segments(
-            args.kap_nr, args.kap_titel, args.input, draft_path
+        report, review = run_checks(
+            args.kap_nr, args.kap_titel, args.input, paths, use_cache=not args.no_cache
         )
-    except Exception as exc:
-        LOGGER.error("Review fehlgeschlagen: %s", exc)
+    except PipelineError as exc:
+        LOGGER.error("%s", exc)
         sys.exit(1)
 
-    review_report_path.write_text(
-        json.dumps(review, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-    LOGGER.info("Review-Report gespeichert unter %s", review_report_path)
-
     proceed = True
     if not args.non_interactive and (
         report.get("warnings") or review.get("findings")
@@ -137,18 +184,11 @@ def main() -> None:
         LOGGER.info("Pipeline wurde vom Benutzer abgebrochen. Dateien bleiben bestehen.")
         return
 
-    LOGGER.info("4/5 Konvertiere Segmente in JSONL ...")
     try:
-        convert_module.convert_file(draft_path, final_jsonl_path)
-    except Exception as exc:
-        LOGGER.error("Konvertierung nach JSONL fehlgeschlagen: %s", exc)
-        sys.exit(1)
-
-    LOGGER.info("5/5 Aktualisiere Embedding-Index ...")
-    try:
-        add_chapter_module.add_chapter(str(final_jsonl_path), str(Path(settings.PATH_INDEX)))
-    except Exception as exc:
-        LOGGER.error("Import in den Index fehlgeschlagen: %s", exc)
+        convert_chapter(paths)
+        import_chapter(paths)
+    except PipelineError as exc:
+        LOGGER.error("%s", exc)
         sys.exit(1)
 
     LOGGER.info(
@@ -1,28 +1,22 @@
-import os
-import pickle
 from pathlib import Path
 
-import numpy as np
-from openai import OpenAI
-from dotenv import load_dotenv
+from backend.config.settings import EMBEDDING_DIM, INDEX_PATH as CONFIG_INDEX_PATH, MODEL_NAME, TOP_K
+from backend.scripts.index_utils import load_hnsw, load_index, load_scales, search_index
+from backend.scripts.openai_utils import get_client
 
-from backend.config.settings import INDEX_PATH as CONFIG_INDEX_PATH, MODEL_NAME, TOP_K
-
-# 🔑 ENV laden
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# 🔑 gemeinsamer Client (lädt die .env aus dem Projektstamm nur einmal)
+client = get_client()
 
 INDEX_PATH = Path(__file__).resolve().parents[2] / CONFIG_INDEX_PATH
 
-# Kosinus-Ähnlichkeit
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-
-# Index laden
-with open(INDEX_PATH, "rb") as f:
-    index = pickle.load(f)
+# Index laden (Metadaten + memory-mapped Embedding-Matrix, Zeile i ↔ meta[i])
+meta, vectors = load_index(INDEX_PATH)
+if vectors is None:
+    raise FileNotFoundError(f"Index nicht gefunden: {INDEX_PATH}")
+scales = load_scales(INDEX_PATH)  # nur bei int8-Index
+ann = load_hnsw(INDEX_PATH)  # nur mit faiss und großem Index, sonst lineare Suche
 
-print(f"📚 Index geladen mit {len(index)} Segmenten.")
+print(f"📚 Index geladen mit {len(meta)} Segmenten.")
 
 # Nutzerfrage
 query = input("❓ Deine Frage: ")
@@ -30,17 +24,13 @@ query = input("❓ Deine Frage: ")
 # Embedding für die Frage
 query_embedding = client.embeddings.create(
     model=MODEL_NAME,
-    input=query
+    input=query,
+    dimensions=EMBEDDING_DIM,
 ).data[0].embedding
 
-# Scoring
-scored_segments = []
-for seg in index:
-    score = cosine_similarity(query_embedding, seg["embedding"])
-    scored_segments.append((score, seg))
-
-scored_segments.sort(key=lambda x: x[0], reverse=True)
-top_segments = [seg for _, seg in scored_segments[:TOP_K]]
+# Scoring: Kosinus-Ähnlichkeit (HNSW-Graph oder alle Segmente der gemappten Matrix)
+top_idx, _ = search_index(vectors, query_embedding, TOP_K, scales, ann)
+top_segments = [meta[i] for i in top_idx]
 
 # Kontexte vorbereiten
 context_texts = "\n\n".join([f"{s['kap_titel']} (Abschnitt {s['seg_nr']}):\n{s['text']}" for s in top_segments])
@@ -7,20 +7,12 @@ import json
 import logging
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
-
-from dotenv import load_dotenv
-
-try:
-    from openai import OpenAI
-except ImportError as exc:  # pragma: no cover - graceful error
-    raise SystemExit(
-        "Das Paket 'openai' wird benötigt, ist aber nicht installiert."
-    ) from exc
+from typing import Any, Dict, List, Optional
 
 from backend.config import settings
 from backend.scripts import utils
-from backend.scripts.segment_utils import compute_offsets, load_segments, normalise_text
+from backend.scripts.openai_utils import get_client, with_retry
+from backend.scripts.segment_utils import compute_offsets, load_segments, read_chapter_text
 
 LOGGER = logging.getLogger(__name__)
 CONTEXT_CHARS = 160
@@ -33,7 +25,7 @@ def build_payload(
     payload: List[Dict[str, Any]] = []
     for seg, (start, end) in zip(segments, offsets):
         previous = original_text[max(0, start - CONTEXT_CHARS) : start]
-        following = original_text[end : min(len(original_text), end + CONTEXT_CHARS)]
+        following = original_text[end : end + CONTEXT_CHARS]
         payload.append(
             {
                 "id": seg.get("id"),
@@ -60,7 +52,7 @@ def build_prompt(kap_nr: int, kap_titel: str, payload: List[Dict[str, Any]]) ->
         " (low/medium/high) und message."
         " Wenn es keine Auffälligkeiten gibt, gib eine leere Liste zurück."
     )
-    payload_json = json.dumps(payload, ensure_ascii=False)
+    payload_json = utils.json_dumps(payload).decode("utf-8")
     return (
         f"{instructions}\nKapitelnummer: {kap_nr}\nKapiteltitel: {kap_titel}\n"
         f"Segmente: {payload_json}"
@@ -68,9 +60,9 @@ def build_prompt(kap_nr: int, kap_titel: str, payload: List[Dict[str, Any]]) ->
 
 
 def call_model(prompt: str) -> str:
-    load_dotenv()
-    client = OpenAI()
-    response = client.chat.completions.create(
+    client = get_client()
+    response = with_retry(
+        client.chat.completions.create,
         model=settings.MODEL_REVIEW,
         temperature=0,
         messages=[
@@ -92,7 +84,7 @@ def call_model(prompt: str) -> str:
 
 def parse_report(raw: str, kap_nr: int, kap_titel: str) -> Dict[str, Any]:
     try:
-        data = json.loads(raw)
+        data = utils.json_loads(raw)
     except json.JSONDecodeError as exc:
         LOGGER.error("Review-Antwort ist kein gültiges JSON: %s", exc)
         raise
@@ -121,8 +113,10 @@ def review_segments(
     kap_titel: str,
     input_path: Path,
     segments_path: Path,
+    original_text: Optional[str] = None,
 ) -> Dict[str, Any]:
-    original_text = normalise_text(input_path.read_text(encoding="utf-8"))
+    if original_text is None:
+        original_text = read_chapter_text(input_path)
     segments = load_segments(segments_path)
     payload = build_payload(original_text, segments)
     prompt = build_prompt(kap_nr, kap_titel, payload)
@@ -163,7 +157,7 @@ def main() -> None:
         report_path = Path(settings.PATH_SEGMENTE) / f"{base}_review.json"
 
     report_path.parent.mkdir(parents=True, exist_ok=True)
-    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    report_path.write_bytes(utils.json_dumps(report, indent=True))
     LOGGER.info("Review-Report gespeichert unter %s", report_path)
 
 
@@ -3,33 +3,85 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import functools
 import json
 import logging
+import os
 import sys
+from hashlib import blake2b
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from backend.config import settings
-from backend.scripts.segment_utils import id_matches, save_segments
-from backend.scripts.utils import default_segment_path, ensure_directories
+from backend.scripts.openai_utils import (
+    RateLimiter,
+    get_client,
+    new_async_client,
+    with_retry,
+    with_retry_async,
+)
+from backend.scripts.segment_utils import id_matches, read_chapter_text, save_segments
+from backend.scripts.utils import (
+    default_segment_path,
+    ensure_directories,
+    json_dumps,
+    json_loads,
+    load_manifest,
+)
 
 LOGGER = logging.getLogger(__name__)
 PROMPT_FILE = Path(__file__).with_name("segmentierung_prompt.md")
+LLM_CACHE_DIR = Path(settings.PATH_SEGMENTE) / ".llm_cache"  # Prompt-Hash → Antwort
+SYSTEM_PROMPT = (
+    "Du bist ein akribischer Editor, der Kapiteltexte ohne Änderungen "
+    "segmentiert und konsistente IDs vergibt."
+)
+# Grenzen für segment_chapters(); an das Rate-Limit des API-Kontos anpassen
+MAX_CONCURRENT = 4
+MAX_REQUESTS_PER_MINUTE = 60
+MAX_TOKENS_PER_MINUTE = 200_000
+# Pflichtfelder je Segment mit erwartetem Typ (Reihenfolge = Prüfreihenfolge)
+SEGMENT_FIELDS = (
+    ("id", str, "ein String"),
+    ("kap_nr", int, "ein Integer"),
+    ("kap_titel", str, "ein String"),
+    ("seg_nr", int, "ein Integer"),
+    ("word_count", int, "ein Integer"),
+    ("text", str, "ein String"),
+)
+SEGMENT_KEYS = frozenset(key for key, _, _ in SEGMENT_FIELDS)
+
+
+@functools.lru_cache(maxsize=1)
+def _cached_template(mtime_ns: int) -> str:
+    return PROMPT_FILE.read_text(encoding="utf-8")
 
 
 def load_prompt_template() -> str:
-    if not PROMPT_FILE.exists():
+    # Datei nur neu lesen, wenn sie sich seit dem letzten Aufruf geändert hat
+    try:
+        mtime_ns = PROMPT_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
         raise FileNotFoundError(
             f"Prompt-Datei wurde nicht gefunden: {PROMPT_FILE}"
-        )
-    return PROMPT_FILE.read_text(encoding="utf-8")
+        ) from None
+    return _cached_template(mtime_ns)
 
 
-def build_prompt(kap_nr: int, kap_titel: str, text: str) -> str:
-    template = load_prompt_template()
+def prompt_prefix() -> str:
+    """Return the chapter-independent start of the prompt (template + rules).
+
+    Everything chapter-specific follows after it, so the API can serve this
+    prefix from its prompt cache for every chapter of a run.
+    """
+    return _build_prefix(load_prompt_template())
+
+
+@functools.lru_cache(maxsize=1)
+def _build_prefix(template: str) -> str:
     rules = (
         "Segmentierungsregeln:\n"
         f"- Decke den gesamten Text ohne Auslassungen ab.\n"
@@ -43,12 +95,17 @@ def build_prompt(kap_nr: int, kap_titel: str, text: str) -> str:
         "- Optional: char_start und char_end können ergänzt werden, falls verfügbar.\n"
         "- Stelle sicher, dass word_count zur tatsächlichen Wortanzahl passt.\n"
     )
+    return f"{template}\n\n{rules}"
+
+
+def build_prompt(kap_nr: int, kap_titel: str, text: str) -> str:
+    # nur der Teil ab den Metadaten ändert sich von Kapitel zu Kapitel
     metadata = (
         f"Kapitelnummer: {kap_nr}\n"
         f"Kapiteltitel: {kap_titel}\n"
     )
     prompt = (
-        f"{template}\n\n{rules}\n{metadata}\n"
+        f"{prompt_prefix()}\n{metadata}\n"
         "Kapiteltext (übernimm exakt diesen Text, keine Änderungen):\n"
         "<<<TEXT_BEGIN>>>\n"
         f"{text}\n"
@@ -58,32 +115,106 @@ def build_prompt(kap_nr: int, kap_titel: str, text: str) -> str:
     return prompt
 
 
-def call_model(prompt: str) -> str:
-    load_dotenv()
-    client = OpenAI()
-    response = client.chat.completions.create(
+def build_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _chunk_text(chunk: Any) -> str:
+    # Der letzte Chunk kann ohne choices kommen (z. B. Nutzungsdaten)
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+def _stream_completion(client: Any, prompt: str) -> str:
+    # gestreamt: lange Antworten laufen nicht in den Lese-Timeout
+    stream = client.chat.completions.create(
         model=settings.MODEL_SEGMENTATION,
         temperature=0,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "Du bist ein akribischer Editor, der Kapiteltexte ohne Änderungen "
-                    "segmentiert und konsistente IDs vergibt."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
+        messages=build_messages(prompt),
+        stream=True,
     )
-    try:
-        return response.choices[0].message.content or ""
-    except (AttributeError, IndexError):  # pragma: no cover - defensive coding
-        raise RuntimeError("Unerwartete Antwortstruktur der OpenAI-API.")
+    return "".join(_chunk_text(chunk) for chunk in stream)
+
+
+async def _stream_completion_async(client: AsyncOpenAI, prompt: str) -> str:
+    stream = await client.chat.completions.create(
+        model=settings.MODEL_SEGMENTATION,
+        temperature=0,
+        messages=build_messages(prompt),
+        stream=True,
+    )
+    return "".join([_chunk_text(chunk) async for chunk in stream])
+
+
+def _cache_path(prompt: str) -> Path:
+    # Modell, Temperatur und System-Prompt bestimmen die Antwort mit
+    raw = f"{settings.MODEL_SEGMENTATION}|0|{SYSTEM_PROMPT}|{prompt}".encode("utf-8")
+    return LLM_CACHE_DIR / f"{blake2b(raw, digest_size=16).hexdigest()}.json"
+
+
+def load_cached_response(prompt: str) -> Optional[str]:
+    """Return the stored model answer for ``prompt``, if any."""
+    path = _cache_path(prompt)
+    if not path.exists():
+        return None
+    LOGGER.info("Antwort aus dem Cache übernommen: %s", path)
+    return json_loads(path.read_bytes())["content"]
+
+
+def save_cached_response(prompt: str, content: str) -> None:
+    """Store an answer for ``prompt``; only call this once it passed the checks."""
+    path = _cache_path(prompt)
+    ensure_directories([path.parent])
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(json_dumps({"model": settings.MODEL_SEGMENTATION, "content": content}))
+    os.replace(tmp, path)
+
+
+def call_model(prompt: str) -> str:
+    # Retry umfasst auch das Lesen des Streams, nicht nur den Verbindungsaufbau
+    return with_retry(_stream_completion, get_client(), prompt)
+
+
+def estimate_tokens(prompt: str) -> int:
+    # Eingabe plus eine etwa gleich lange Antwort (der Text kommt 1:1 zurück)
+    return 2 * (len(prompt) // 4 + 1)
+
+
+async def call_model_async(
+    prompt: str,
+    client: AsyncOpenAI,
+    sem: asyncio.Semaphore,
+    limiter: Optional[RateLimiter] = None,
+) -> str:
+    async with sem:
+        if limiter is not None:
+            await limiter.acquire(estimate_tokens(prompt))
+        return await with_retry_async(_stream_completion_async, client, prompt)
+
+
+async def _call_models(
+    prompts: List[str],
+    concurrency: int,
+    max_requests_per_minute: float,
+    max_tokens_per_minute: float,
+) -> List[Any]:
+    sem = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(max_requests_per_minute, max_tokens_per_minute)
+    # ein Client (und Verbindungspool) für alle Kapitel
+    async with new_async_client() as client:
+        return await asyncio.gather(
+            *(call_model_async(p, client, sem, limiter) for p in prompts),
+            return_exceptions=True,
+        )
 
 
 def parse_segments(raw: str) -> List[Dict[str, Any]]:
     try:
-        data = json.loads(raw)
+        data = json_loads(raw)
     except json.JSONDecodeError as exc:
         LOGGER.error("Antwort ist kein gültiges JSON: %s", exc)
         raise
@@ -105,38 +236,24 @@ def parse_segments(raw: str) -> List[Dict[str, Any]]:
 
 
 def schema_check(segments: List[Dict[str, Any]], kap_nr: int, kap_titel: str) -> None:
+    kap_nr = int(kap_nr)
+    kap_titel = kap_titel.strip()
     for idx, seg in enumerate(segments, start=1):
-        missing = {
-            "id",
-            "kap_nr",
-            "kap_titel",
-            "seg_nr",
-            "word_count",
-            "text",
-        } - set(seg.keys())
-        if missing:
+        if not SEGMENT_KEYS <= seg.keys():
+            missing = SEGMENT_KEYS - seg.keys()
             raise ValueError(
                 f"Segment {idx} fehlt folgende Pflichtfelder: {sorted(missing)}"
             )
 
-        if not isinstance(seg["id"], str):
-            raise TypeError(f"Segment {idx}: id muss ein String sein.")
-        if not isinstance(seg["kap_nr"], int):
-            raise TypeError(f"Segment {idx}: kap_nr muss ein Integer sein.")
-        if not isinstance(seg["kap_titel"], str):
-            raise TypeError(f"Segment {idx}: kap_titel muss ein String sein.")
-        if not isinstance(seg["seg_nr"], int):
-            raise TypeError(f"Segment {idx}: seg_nr muss ein Integer sein.")
-        if not isinstance(seg["word_count"], int):
-            raise TypeError(f"Segment {idx}: word_count muss ein Integer sein.")
-        if not isinstance(seg["text"], str):
-            raise TypeError(f"Segment {idx}: text muss ein String sein.")
-
-        if seg["kap_nr"] != int(kap_nr):
+        for key, expected, label in SEGMENT_FIELDS:
+            if not isinstance(seg[key], expected):
+                raise TypeError(f"Segment {idx}: {key} muss {label} sein.")
+
+        if seg["kap_nr"] != kap_nr:
             raise ValueError(
                 f"Segment {idx}: kap_nr {seg['kap_nr']} passt nicht zu {kap_nr}."
             )
-        if seg["kap_titel"].strip() != kap_titel.strip():
+        if seg["kap_titel"].strip() != kap_titel:
             raise ValueError(
                 "kap_titel des Segments stimmt nicht mit der Eingabe überein."
             )
@@ -155,16 +272,10 @@ def schema_check(segments: List[Dict[str, Any]], kap_nr: int, kap_titel: str) ->
                 raise TypeError(f"Segment {idx}: {key} muss ein Integer sein, falls vorhanden.")
 
 
-def segment_chapter(
-    kap_nr: int,
-    kap_titel: str,
-    input_path: Path,
-    output_path: Path,
+def store_segments(
+    raw_response: str, kap_nr: int, kap_titel: str, output_path: Path
 ) -> List[Dict[str, Any]]:
-    text = input_path.read_text(encoding="utf-8")
-    prompt = build_prompt(kap_nr, kap_titel, text)
-    LOGGER.info("Starte Segmentierung mit Modell %s", settings.MODEL_SEGMENTATION)
-    raw_response = call_model(prompt)
+    """Parse and check a model response and save it as draft JSON."""
     segments = parse_segments(raw_response)
     schema_check(segments, kap_nr, kap_titel)
     ensure_directories([output_path.parent])
@@ -173,24 +284,207 @@ def segment_chapter(
     return segments
 
 
+def segment_chapter(
+    kap_nr: int,
+    kap_titel: str,
+    input_path: Path,
+    output_path: Path,
+    original_text: Optional[str] = None,
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
+    if original_text is None:
+        original_text = read_chapter_text(input_path)
+    prompt = build_prompt(kap_nr, kap_titel, original_text)
+    raw_response = load_cached_response(prompt) if use_cache else None
+    fresh = raw_response is None
+    if fresh:
+        LOGGER.info("Starte Segmentierung mit Modell %s", settings.MODEL_SEGMENTATION)
+        raw_response = call_model(prompt)
+    segments = store_segments(raw_response, kap_nr, kap_titel, output_path)
+    # erst nach bestandener Prüfung cachen, sonst käme eine kaputte Antwort immer wieder
+    if fresh:
+        save_cached_response(prompt, raw_response)
+    return segments
+
+
+def job_output_path(job: Dict[str, Any]) -> Path:
+    if job.get("output"):
+        return Path(job["output"])
+    return default_segment_path(
+        int(job["kap_nr"]), str(job["kap_titel"]), Path(settings.PATH_SEGMENTE)
+    )
+
+
+def segment_chapters(
+    jobs: List[Dict[str, Any]],
+    concurrency: int = MAX_CONCURRENT,
+    max_requests_per_minute: float = MAX_REQUESTS_PER_MINUTE,
+    max_tokens_per_minute: float = MAX_TOKENS_PER_MINUTE,
+    use_cache: bool = True,
+) -> List[Any]:
+    """Segment several chapters with concurrent, rate-limited API calls.
+
+    Each job is a dict with ``kap_nr``, ``kap_titel``, ``input`` and optionally
+    ``output``. Returns, in job order, the segments of each chapter or the
+    exception that stopped it, so one failing chapter does not abort the rest.
+    Stored answers are reused unless ``use_cache`` is false.
+    """
+    if concurrency <= 0:
+        raise ValueError("concurrency muss größer als 0 sein.")
+    results: List[Any] = [None] * len(jobs)
+    prompts: List[str] = []
+    pending: List[int] = []
+    for idx, job in enumerate(jobs):
+        try:
+            text = read_chapter_text(Path(job["input"]))
+            prompts.append(build_prompt(int(job["kap_nr"]), str(job["kap_titel"]), text))
+        except (OSError, KeyError, ValueError) as exc:
+            results[idx] = exc
+            continue
+        pending.append(idx)
+    if not prompts:
+        return results
+
+    responses: List[Any] = [load_cached_response(p) if use_cache else None for p in prompts]
+    todo = [i for i, raw in enumerate(responses) if raw is None]
+    if todo:
+        LOGGER.info(
+            "Starte Segmentierung von %s Kapitel(n) mit Modell %s",
+            len(todo),
+            settings.MODEL_SEGMENTATION,
+        )
+        fetched = asyncio.run(
+            _call_models(
+                [prompts[i] for i in todo],
+                concurrency,
+                max_requests_per_minute,
+                max_tokens_per_minute,
+            )
+        )
+        for i, raw in zip(todo, fetched):
+            responses[i] = raw
+    fresh = set(todo)
+
+    for i, (idx, raw) in enumerate(zip(pending, responses)):
+        if isinstance(raw, BaseException):
+            results[idx] = raw
+            continue
+        job = jobs[idx]
+        try:
+            results[idx] = store_segments(
+                raw, int(job["kap_nr"]), str(job["kap_titel"]), job_output_path(job)
+            )
+        except (ValueError, TypeError, OSError) as exc:
+            results[idx] = exc
+            continue
+        if i in fresh:
+            save_cached_response(prompts[i], raw)
+    return results
+
+
 def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Segmentiert ein Kapitel.")
-    parser.add_argument("--kap-nr", type=int, required=True, help="Kapitelnummer")
-    parser.add_argument("--kap-titel", type=str, required=True, help="Kapiteltitel")
-    parser.add_argument("--input", type=Path, required=True, help="Pfad zur TXT-Datei")
+    parser = argparse.ArgumentParser(
+        description="Segmentiert ein Kapitel (oder mit --manifest mehrere parallel)."
+    )
+    parser.add_argument("--kap-nr", type=int, help="Kapitelnummer")
+    parser.add_argument("--kap-titel", type=str, help="Kapiteltitel")
+    parser.add_argument("--input", type=Path, help="Pfad zur TXT-Datei")
     parser.add_argument(
         "--output",
         type=Path,
         required=False,
         help="Pfad zur Draft-JSON-Datei",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        help="JSON-Liste der Kapitel (wie bei batch_process_chapter.py)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_CONCURRENT,
+        help=f"gleichzeitige Anfragen mit --manifest (Standard: {MAX_CONCURRENT})",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=MAX_REQUESTS_PER_MINUTE,
+        help=f"Rate-Limit für Anfragen (Standard: {MAX_REQUESTS_PER_MINUTE})",
+    )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=float,
+        default=MAX_TOKENS_PER_MINUTE,
+        help=f"Rate-Limit für geschätzte Tokens (Standard: {MAX_TOKENS_PER_MINUTE})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="gespeicherte Modellantwort ignorieren und neu anfragen",
+    )
+    args = parser.parse_args()
+    for flag, value in (
+        ("--concurrency", args.concurrency),
+        ("--requests-per-minute", args.requests_per_minute),
+        ("--tokens-per-minute", args.tokens_per_minute),
+    ):
+        if value <= 0:
+            parser.error(f"{flag} muss größer als 0 sein")
+    if args.manifest is None:
+        missing = [
+            flag
+            for flag, value in (
+                ("--kap-nr", args.kap_nr),
+                ("--kap-titel", args.kap_titel),
+                ("--input", args.input),
+            )
+            if value is None
+        ]
+        if missing:
+            parser.error(f"ohne --manifest erforderlich: {', '.join(missing)}")
+    elif args.output is not None:
+        parser.error("--output gilt nur für ein einzelnes Kapitel; im Manifest je Kapitel angeben")
+    return args
+
+
+def _main_manifest(args: argparse.Namespace) -> None:
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as exc:
+        LOGGER.error("Manifest konnte nicht gelesen werden: %s", exc)
+        sys.exit(1)
+
+    results = segment_chapters(
+        jobs,
+        concurrency=args.concurrency,
+        max_requests_per_minute=args.requests_per_minute,
+        max_tokens_per_minute=args.tokens_per_minute,
+        use_cache=not args.no_cache,
+    )
+    failed = 0
+    for job, result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            LOGGER.error(
+                "Kapitel %s »%s«: Segmentierung fehlgeschlagen: %s",
+                job["kap_nr"],
+                job["kap_titel"],
+                result,
+            )
+            failed += 1
+    LOGGER.info("%s von %s Kapitel(n) segmentiert.", len(jobs) - failed, len(jobs))
+    if failed:
+        sys.exit(1)
 
 
 def main() -> None:
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     args = parse_args()
 
+    if args.manifest is not None:
+        _main_manifest(args)
+        return
+
     output_path = args.output
     if output_path is None:
         output_path = default_segment_path(
@@ -198,7 +492,9 @@ def main() -> None:
         )
 
     try:
-        segment_chapter(args.kap_nr, args.kap_titel, args.input, output_path)
+        segment_chapter(
+            args.kap_nr, args.kap_titel, args.input, output_path, use_cache=not args.no_cache
+        )
     except Exception as exc:
         LOGGER.error("Segmentierung fehlgeschlagen: %s", exc)
         sys.exit(1)
@@ -0,0 +1,174 @@
+"""Segmentiert viele Kapitel über die OpenAI Batch API.
+
+Alle Prompts werden als JSONL hochgeladen und asynchron verarbeitet (günstiger
+als Einzelaufrufe, Ergebnis innerhalb von 24 Stunden). Das Skript wartet auf
+den Batch und speichert jede Antwort wie ``segment_chapter.py`` als Draft-JSON.
+
+Die Manifest-Datei entspricht der von ``batch_process_chapter.py``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from backend.config import settings
+from backend.scripts import utils
+from backend.scripts.openai_utils import get_client, with_retry
+from backend.scripts.segment_chapter import (
+    build_messages,
+    build_prompt,
+    job_output_path,
+    store_segments,
+)
+from backend.scripts.segment_utils import read_chapter_text
+
+LOGGER = logging.getLogger(__name__)
+ENDPOINT = "/v1/chat/completions"
+FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+POLL_INTERVAL = 60.0
+
+
+def build_requests(jobs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Return one Batch-API request per job, keyed by its ``custom_id``."""
+    requests: Dict[str, Dict[str, Any]] = {}
+    for job in jobs:
+        kap_nr = int(job["kap_nr"])
+        kap_titel = str(job["kap_titel"])
+        custom_id = utils.chapter_basename(kap_nr, kap_titel)
+        if custom_id in requests:
+            raise ValueError(f"Kapitel doppelt im Manifest: {custom_id}")
+        prompt = build_prompt(kap_nr, kap_titel, read_chapter_text(Path(job["input"])))
+        requests[custom_id] = {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": ENDPOINT,
+            "body": {
+                "model": settings.MODEL_SEGMENTATION,
+                "temperature": 0,
+                "messages": build_messages(prompt),
+            },
+        }
+    return requests
+
+
+def submit_batch(client, requests: Dict[str, Dict[str, Any]]) -> str:
+    payload = b"".join(utils.json_dumps(r) + b"\n" for r in requests.values())
+    upload = with_retry(
+        client.files.create, file=("segmentierung.jsonl", payload), purpose="batch"
+    )
+    batch = with_retry(
+        client.batches.create,
+        input_file_id=upload.id,
+        endpoint=ENDPOINT,
+        completion_window="24h",
+    )
+    LOGGER.info("Batch %s mit %s Kapitel(n) angelegt.", batch.id, len(requests))
+    return batch.id
+
+
+def wait_for_batch(client, batch_id: str, poll_interval: float = POLL_INTERVAL):
+    while True:
+        batch = with_retry(client.batches.retrieve, batch_id)
+        if batch.status in FINAL_STATES:
+            return batch
+        counts = batch.request_counts
+        LOGGER.info(
+            "Batch %s: %s (%s/%s fertig)",
+            batch_id,
+            batch.status,
+            getattr(counts, "completed", "?"),
+            getattr(counts, "total", "?"),
+        )
+        time.sleep(poll_interval)
+
+
+def read_results(client, file_id: str) -> Dict[str, Dict[str, Any]]:
+    content = with_retry(client.files.content, file_id)
+    results: Dict[str, Dict[str, Any]] = {}
+    for line in content.read().splitlines():
+        if line.strip():
+            entry = utils.json_loads(line)
+            results[entry["custom_id"]] = entry
+    return results
+
+
+def _response_text(entry: Dict[str, Any]) -> str:
+    if entry.get("error"):
+        raise RuntimeError(f"Batch-Fehler: {entry['error']}")
+    response = entry.get("response") or {}
+    if response.get("status_code") != 200:
+        raise RuntimeError(f"HTTP {response.get('status_code')}: {response.get('body')}")
+    try:
+        return response["body"]["choices"][0]["message"]["content"] or ""
+    except (KeyError, IndexError, TypeError):
+        raise RuntimeError("Unerwartete Antwortstruktur der OpenAI-API.")
+
+
+def store_results(jobs: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]]) -> int:
+    """Save every successful result as draft JSON; returns the number of failures."""
+    failed = 0
+    for job in jobs:
+        kap_nr = int(job["kap_nr"])
+        kap_titel = str(job["kap_titel"])
+        custom_id = utils.chapter_basename(kap_nr, kap_titel)
+        try:
+            if custom_id not in results:
+                raise RuntimeError("keine Antwort im Batch-Ergebnis")
+            raw = _response_text(results[custom_id])
+            store_segments(raw, kap_nr, kap_titel, job_output_path(job))
+        except Exception as exc:  # Fehler eines Kapitels bricht den Batch nicht ab
+            LOGGER.error("%s: %s", custom_id, exc)
+            failed += 1
+    return failed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Kapitel über die Batch API segmentieren.")
+    parser.add_argument("manifest", type=Path, help="JSON-Liste der Kapitel")
+    parser.add_argument(
+        "--batch-id",
+        help="bereits angelegten Batch abholen, statt einen neuen hochzuladen",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=POLL_INTERVAL,
+        help="Sekunden zwischen zwei Statusabfragen (Standard: 60)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    args = parse_args()
+
+    try:
+        jobs = utils.load_manifest(args.manifest)
+        client = get_client()
+        batch_id = args.batch_id or submit_batch(client, build_requests(jobs))
+        batch = wait_for_batch(client, batch_id, args.poll_interval)
+    except Exception as exc:
+        LOGGER.error("Batch-Segmentierung fehlgeschlagen: %s", exc)
+        sys.exit(1)
+
+    if batch.status != "completed":
+        LOGGER.error("Batch %s endete mit Status %s.", batch_id, batch.status)
+        sys.exit(1)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if file_id:
+            results.update(read_results(client, file_id))
+    failed = store_results(jobs, results)
+    LOGGER.info("%s von %s Kapitel(n) segmentiert.", len(jobs) - failed, len(jobs))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
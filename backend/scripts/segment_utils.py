@@ -2,18 +2,18 @@
 
 from __future__ import annotations
 
-import json
 import re
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
+from backend.scripts.utils import json_dumps, json_loads
+
 _WORD_PATTERN = re.compile(r"\b\w+\b", re.UNICODE)
 
 
 def load_segments(path: Path) -> List[Dict[str, Any]]:
     """Load a JSON file containing a list of segment dicts."""
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = json_loads(path.read_bytes())
     if not isinstance(data, list):
         raise ValueError("Segmentdatei muss ein JSON-Array enthalten.")
     return data
@@ -21,8 +21,9 @@ def load_segments(path: Path) -> List[Dict[str, Any]]:
 
 def save_segments(path: Path, segments: Iterable[Dict[str, Any]]) -> None:
     """Write ``segments`` as UTF-8 JSON."""
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(list(segments), f, ensure_ascii=False, indent=2)
+    if not isinstance(segments, list):
+        segments = list(segments)
+    path.write_bytes(json_dumps(segments, indent=True))
 
 
 def count_words(text: str) -> int:
@@ -35,11 +36,17 @@ def normalise_text(text: str) -> str:
     return text.replace("\r\n", "\n")
 
 
+def read_chapter_text(path: Path) -> str:
+    """Read a chapter TXT file and return its normalised text."""
+    return normalise_text(path.read_text(encoding="utf-8"))
+
+
 def compute_offsets(original_text: str, segments: Sequence[Dict[str, Any]]) -> List[Tuple[int, int]]:
     """Compute (start, end) character offsets for ``segments``.
 
-    Segments must appear in order without gaps. Raises ``ValueError`` if a
-    segment text is not found at the expected position.
+    Segments must appear in order without gaps, so a single forward pass with
+    a running cursor suffices. Raises ``ValueError`` if a segment text is not
+    found at the expected position.
     """
 
     offsets: List[Tuple[int, int]] = []
@@ -48,13 +55,12 @@ def compute_offsets(original_text: str, segments: Sequence[Dict[str, Any]]) -> L
         text = seg.get("text", "")
         if not isinstance(text, str):
             raise ValueError("Segment enthält kein Textfeld vom Typ String.")
-        end = cursor + len(text)
-        snippet = original_text[cursor:end]
-        if snippet != text:
+        if not original_text.startswith(text, cursor):
             raise ValueError(
                 "Segmenttext stimmt nicht mit dem Originaltext überein (ID "
                 f"{seg.get('id', 'unbekannt')})."
             )
+        end = cursor + len(text)
         offsets.append((cursor, end))
         cursor = end
     return offsets
@@ -64,8 +70,7 @@ def id_matches(kap_nr: int, seg_id: str, seg_nr: int) -> bool:
     """Return whether ``seg_id`` matches the canonical pattern."""
     if not isinstance(seg_id, str):
         return False
-    pattern = rf"^K{int(kap_nr):03d}-S{int(seg_nr):03d}$"
-    return re.fullmatch(pattern, seg_id) is not None
+    return seg_id == f"K{int(kap_nr):03d}-S{int(seg_nr):03d}"
 
 
 __all__ = [
@@ -73,6 +78,7 @@ __all__ = [
     "save_segments",
     "count_words",
     "normalise_text",
+    "read_chapter_text",
     "compute_offsets",
     "id_matches",
 ]
@@ -2,9 +2,18 @@
 
 from __future__ import annotations
 
+import json
 import re
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Dict, Iterable, List
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_SLUG_RE = re.compile(r"[^0-9A-Za-z]+")
+MANIFEST_FIELDS = ("kap_nr", "kap_titel", "input")
 
 
 def project_root() -> Path:
@@ -18,9 +27,26 @@ def ensure_directories(paths: Iterable[Path]) -> None:
         directory.mkdir(parents=True, exist_ok=True)
 
 
+def json_loads(data: str | bytes) -> Any:
+    """Parse JSON from ``data`` (uses ``orjson`` when installed)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any, *, indent: bool = False) -> bytes:
+    """Serialise ``obj`` to UTF-8 JSON bytes, keeping non-ASCII characters."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
 def slugify(value: str) -> str:
     """Convert ``value`` into a filesystem-friendly slug."""
-    slug = re.sub(r"[^0-9A-Za-z]+", "_", value, flags=re.UNICODE).strip("_")
+    slug = _SLUG_RE.sub("_", value).strip("_")
     return slug or "Kapitel"
 
 
@@ -34,10 +60,27 @@ def default_segment_path(kap_nr: int, kap_titel: str, directory: Path) -> Path:
     return directory / f"{chapter_basename(kap_nr, kap_titel)}_draft.json"
 
 
+def load_manifest(path: Path) -> List[Dict[str, Any]]:
+    """Load a chapter manifest: a JSON list of ``kap_nr``/``kap_titel``/``input`` objects."""
+    data = json_loads(path.read_bytes())
+    if not isinstance(data, list):
+        raise ValueError("Manifest muss eine JSON-Liste von Kapiteln enthalten.")
+    for idx, job in enumerate(data, start=1):
+        if not isinstance(job, dict):
+            raise ValueError(f"Manifest-Eintrag {idx} muss ein Objekt sein.")
+        missing = [key for key in MANIFEST_FIELDS if key not in job]
+        if missing:
+            raise ValueError(f"Manifest-Eintrag {idx}: fehlende Felder {missing}")
+    return data
+
+
 __all__ = [
     "project_root",
     "ensure_directories",
+    "json_loads",
+    "json_dumps",
     "slugify",
     "chapter_basename",
     "default_segment_path",
+    "load_manifest",
 ]
@@ -3,11 +3,10 @@
 from __future__ import annotations
 
 import argparse
-import json
 import logging
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from backend.config import settings
 from backend.scripts import utils
@@ -15,7 +14,7 @@ from backend.scripts.segment_utils import (
     count_words,
     id_matches,
     load_segments,
-    normalise_text,
+    read_chapter_text,
     save_segments,
 )
 
@@ -41,8 +40,10 @@ def validate_segments(
     kap_nr_hint: int | None,
     input_path: Path,
     segments_path: Path,
+    original_text: Optional[str] = None,
 ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
-    original_text = normalise_text(input_path.read_text(encoding="utf-8"))
+    if original_text is None:
+        original_text = read_chapter_text(input_path)
     raw_segments = load_segments(segments_path)
 
     if not raw_segments:
@@ -67,8 +68,17 @@ def validate_segments(
 
     cursor = 0
     expected_seg_nr = 1
+    # im Loop unveränderlich – einmal auflösen statt je Segment
+    kap_titel_stripped = kap_titel.strip()
+    min_words = settings.SEG_MIN_WORDS
+    hard_max = settings.SEG_HARD_MAX
 
-    for seg in raw_segments:
+    # Schnellpfad: ergeben alle Texte aneinandergereiht exakt das Original, steht
+    # jedes Segment an seiner Position, solange keines übersprungen wurde.
+    texts = [seg.get("text") if isinstance(seg, dict) else None for seg in raw_segments]
+    joined_matches = all(isinstance(t, str) for t in texts) and "".join(texts) == original_text
+
+    for pos, seg in enumerate(raw_segments):
         seg_id = seg.get("id") if isinstance(seg, dict) else None
         if not isinstance(seg, dict):
             errors.append(
@@ -80,8 +90,8 @@ def validate_segments(
             )
             continue
 
-        missing = REQUIRED_FIELDS - set(seg.keys())
-        if missing:
+        if not REQUIRED_FIELDS <= seg.keys():
+            missing = REQUIRED_FIELDS - seg.keys()
             errors.append(
                 _issue(
                     "schema",
@@ -120,7 +130,7 @@ def validate_segments(
                     f"Kapitelnummer {seg_kap_nr} passt nicht zu {kap_nr}.",
                 )
             )
-        if str(seg.get("kap_titel", "")).strip() != kap_titel.strip():
+        if str(seg.get("kap_titel", "")).strip() != kap_titel_stripped:
             errors.append(
                 _issue(
                     "kap_titel_inconsistent",
@@ -150,8 +160,9 @@ def validate_segments(
 
         start = cursor
         end = start + len(text)
-        snippet = original_text[start:end]
-        if snippet != text:
+        # Vergleich direkt im Original, ohne Teilstring-Kopie je Segment
+        aligned = joined_matches and len(normalised_segments) == pos
+        if not aligned and not original_text.startswith(text, start):
             errors.append(
                 _issue(
                     "text_mismatch",
@@ -188,20 +199,20 @@ def validate_segments(
                 )
             )
 
-        if actual_word_count < settings.SEG_MIN_WORDS:
+        if actual_word_count < min_words:
             warnings.append(
                 _issue(
                     "segment_length",
                     seg_id,
-                    f"Segment hat nur {actual_word_count} Wörter (< {settings.SEG_MIN_WORDS}).",
+                    f"Segment hat nur {actual_word_count} Wörter (< {min_words}).",
                 )
             )
-        if actual_word_count > settings.SEG_HARD_MAX:
+        if actual_word_count > hard_max:
             warnings.append(
                 _issue(
                     "segment_length",
                     seg_id,
-                    f"Segment hat {actual_word_count} Wörter (> {settings.SEG_HARD_MAX}).",
+                    f"Segment hat {actual_word_count} Wörter (> {hard_max}).",
                 )
             )
 
@@ -286,7 +297,7 @@ def main() -> None:
         report_path = Path(settings.PATH_SEGMENTE) / f"{base}_validation.json"
 
     report_path.parent.mkdir(parents=True, exist_ok=True)
-    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    report_path.write_bytes(utils.json_dumps(report, indent=True))
     LOGGER.info("Validierungsreport gespeichert unter %s", report_path)
 
     if args.normalized_output: